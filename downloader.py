@@ -14,7 +14,9 @@ Description:
     python downloader.py --save-dir <SAVE_DIR> \
                         --username <USERNAME> \
                         --password <PASSWORD> \
-                        --txt-dir <TXT_FILE_PATH>
+                        --txt-dir <TXT_FILE_PATH> \
+                        [--workers <NUM_WORKERS>] \
+                        [--aggregate <PACK_FILE>]
 
 @Example:
     python downloader.py --save-dir ./downloads \
@@ -23,38 +25,153 @@ Description:
                         --txt-dir urls.txt
 """
 
+import io
 import os
+import errno
 import sys
+import json
+import queue
 import argparse
 import logging
+import logging.handlers
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
 
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+import urllib3
+from urllib3.util.retry import Retry
 from tqdm import tqdm
 
 # Constants
 AUTH_HOST = 'urs.earthdata.nasa.gov'
 LOG_FILE = "download.log"
-CHUNK_SIZE = 1024 * 1024  # 1 MB
+CHUNK_SIZE = 1024 * 1024  # 1 MB, minimum chunk size and fallback without statvfs
+MAX_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB, bounds the per-thread buffers
+BLOCKS_PER_CHUNK = 32
 MAX_RETRIES = 5
-
-def setup_logging(log_path: Path) -> None:
+BACKOFF_FACTOR = 1.0
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+TIMEOUT = (10, 60)  # (connect, read) seconds
+# Errors raised while reading a response body, which the Retry adapter does not cover
+STREAM_ERRORS = (
+    urllib3.exceptions.ProtocolError,
+    urllib3.exceptions.ReadTimeoutError,
+    urllib3.exceptions.IncompleteRead,
+    urllib3.exceptions.InvalidChunkLength
+)
+DEFAULT_WORKERS = 8
+PACK_MAX_FILE_SIZE = 8 * 1024 * 1024  # Larger files are saved on their own in --aggregate mode
+
+def setup_logging(log_path: Path) -> logging.handlers.QueueListener:
     """
     Configures the logging settings.
 
+    Records are put on a queue and written to the file and stdout by a background
+    thread, so logging never blocks the download workers on I/O.
+
     Args:
         log_path (Path): Path to the log file.
+
+    Returns:
+        logging.handlers.QueueListener: The started listener; stop it to flush pending records.
     """
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s [%(levelname)s] %(message)s',
-        handlers=[
-            logging.FileHandler(log_path),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+    handlers = [
+        logging.FileHandler(log_path),
+        logging.StreamHandler(sys.stdout)
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue()
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+def url_to_filename(url: str) -> str:
+    """
+    Derives the local filename from a URL, ignoring any query string or fragment.
+
+    Args:
+        url (str): The URL of the file.
+
+    Returns:
+        str: The basename of the URL path.
+    """
+    return os.path.basename(urlparse(url).path)
+
+def optimal_chunk_size(path: Path) -> int:
+    """
+    Computes a read/write chunk size aligned to the filesystem block size of a path.
+
+    The size is BLOCKS_PER_CHUNK blocks, clamped to [CHUNK_SIZE, MAX_CHUNK_SIZE] and
+    rounded down to a whole number of blocks where the block size allows it.
+
+    Args:
+        path (Path): A path on the target filesystem.
+
+    Returns:
+        int: Chunk size in bytes.
+    """
+    if not hasattr(os, 'statvfs'):
+        return CHUNK_SIZE
+    block_size = os.statvfs(path).f_bsize
+    if not block_size or block_size > MAX_CHUNK_SIZE:
+        return MAX_CHUNK_SIZE if block_size else CHUNK_SIZE
+    size = min(max(CHUNK_SIZE, block_size * BLOCKS_PER_CHUNK), MAX_CHUNK_SIZE)
+    return size - size % block_size
+
+def ensure_free_space(path: Path, response: requests.Response) -> None:
+    """
+    Checks that the filesystem holding a path has room for the response body.
+
+    Uses the Content-Length and leaves the file itself untouched, so the size of a
+    .part file keeps matching the bytes written and stays a valid resume offset.
+    Running out of space is reported before the download starts instead of hours into it.
+
+    Args:
+        path (Path): A path on the target filesystem.
+        response (requests.Response): The response whose body will be written.
+
+    Raises:
+        OSError: With errno ENOSPC if the free space is smaller than the Content-Length.
+    """
+    length = int(response.headers.get('Content-Length', 0))
+    if not length or not hasattr(os, 'statvfs'):
+        return
+    stat = os.statvfs(path)
+    available = stat.f_bavail * stat.f_frsize
+    if available < length:
+        raise OSError(errno.ENOSPC,
+                      f"{length} bytes needed but only {available} available", str(path))
+
+def drop_page_cache(file_handle) -> None:
+    """
+    Flushes a written file to disk and advises the kernel to evict it from the page cache.
+
+    Dirty pages cannot be dropped, so the data is synced first. This is only a cache
+    hint: it is a no-op on platforms without posix_fadvise, and filesystems that reject
+    the calls are logged at debug level rather than failing the download.
+
+    Args:
+        file_handle: An open binary file object.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    file_handle.flush()
+    fd = file_handle.fileno()
+    try:
+        os.fdatasync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError as e:
+        logging.debug("Could not drop %s from the page cache: %s", file_handle.name, e)
 
 class SessionWithHeaderRedirection(requests.Session):
     """
@@ -81,21 +198,25 @@ class SessionWithHeaderRedirection(requests.Session):
             response (requests.Response): The response received.
         """
         super().rebuild_auth(prepared_request, response)
-        original_host = requests.utils.urlparse(response.request.url).hostname
+        # Nothing to strip; skip parsing the URLs on every redirect hop
+        if 'Authorization' not in prepared_request.headers:
+            return
+
         redirect_host = requests.utils.urlparse(prepared_request.url).hostname
+        if redirect_host == AUTH_HOST:
+            return
+        original_host = requests.utils.urlparse(response.request.url).hostname
 
-        if (original_host != redirect_host and
-            redirect_host != AUTH_HOST and
-            original_host != AUTH_HOST):
-            if 'Authorization' in prepared_request.headers:
-                del prepared_request.headers['Authorization']
-                logging.debug(f"Removed Authorization header for host: {redirect_host}")
+        if original_host != redirect_host and original_host != AUTH_HOST:
+            del prepared_request.headers['Authorization']
+            logging.debug(f"Removed Authorization header for host: {redirect_host}")
 
 class Downloader:
     """
     Handles downloading of files from a list of URLs.
     """
-    def __init__(self, save_dir: Path, username: str, password: str, txt_dir: Path):
+    def __init__(self, save_dir: Path, username: str, password: str, txt_dir: Path,
+                 workers: int = DEFAULT_WORKERS, aggregate: Optional[Path] = None):
         """
         Initializes the downloader.
 
@@ -104,16 +225,48 @@ class Downloader:
             username (str): Earthdata username.
             password (str): Earthdata password.
             txt_dir (Path): Path to the text file containing URLs.
+            workers (int): Number of concurrent download threads.
+            aggregate (Optional[Path]): Pack file (relative to save_dir) that receives all
+                downloads instead of one file per URL.
         """
         self.save_dir = save_dir
         self.username = username
         self.password = password
         self.txt_dir = txt_dir
+        self.workers = workers
+        self._tls = threading.local()
+        self._pbar = None
+        self._pbar_lock = threading.Lock()
 
         self.session = SessionWithHeaderRedirection(self.username, self.password)
-        self.session.headers.update({'User-Agent': 'Downloader/1.0'})
+        self.session.headers.update({
+            'User-Agent': 'Downloader/1.0',
+            'Accept-Encoding': 'gzip, deflate'
+        })
+        # Size the connection pool to the worker count so threads share keep-alive connections,
+        # and let urllib3 retry transient failures with exponential backoff
+        retries = Retry(
+            total=MAX_RETRIES,
+            backoff_factor=BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=('GET',),
+            respect_retry_after_header=True
+        )
+        # pool_block makes an extra thread wait for a free connection rather than open a
+        # throwaway one, so every TLS handshake is reused
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers,
+                              max_retries=retries, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
         self.save_dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = optimal_chunk_size(self.save_dir)
+
+        self.pack_path = self.save_dir / aggregate if aggregate else None
+        self.pack_index: List[Dict] = self.load_pack_index() if self.pack_path else []
+        self._pack = None
+        self._pack_lock = threading.Lock()
+
         self.urls = self.load_urls()
         self.to_download = self.filter_existing_files()
 
@@ -125,14 +278,36 @@ class Downloader:
             List[str]: List of URLs to download.
         """
         try:
-            df = pd.read_csv(self.txt_dir, header=None, dtype=str)
-            urls = df.iloc[:, 0].dropna().tolist()
-            logging.info(f"Loaded {len(urls)} URLs from {self.txt_dir}")
-            return urls
+            # utf-8-sig strips the byte order mark some Windows editors prepend
+            lines = self.txt_dir.read_text(encoding='utf-8-sig').splitlines()
+            urls = [line.strip() for line in lines if line.strip()]
+            # Drop duplicate URLs while preserving the input order
+            unique_urls = list(dict.fromkeys(urls))
+            logging.info(f"Loaded {len(unique_urls)} URLs from {self.txt_dir} "
+                         f"({len(urls) - len(unique_urls)} duplicates removed)")
+            return unique_urls
         except Exception as e:
             logging.error(f"Failed to read URLs from {self.txt_dir}: {e}")
             sys.exit(1)
 
+    def load_pack_index(self) -> List[Dict]:
+        """
+        Loads the index of a previously written pack file, if any.
+
+        Returns:
+            List[Dict]: Entries with the name, offset and length of each packed file.
+        """
+        index_path = self.pack_path.with_suffix(self.pack_path.suffix + '.index.json')
+        if not index_path.exists():
+            return []
+        try:
+            index = json.loads(index_path.read_text(encoding='utf-8'))
+            logging.info(f"Loaded {len(index)} packed entries from {index_path}")
+            return index
+        except Exception as e:
+            logging.error(f"Failed to read pack index {index_path}: {e}")
+            sys.exit(1)
+
     def filter_existing_files(self) -> List[str]:
         """
         Filters out URLs whose corresponding files already exist.
@@ -140,48 +315,254 @@ class Downloader:
         Returns:
             List[str]: List of URLs that need to be downloaded.
         """
+        # A single directory listing replaces one stat() call per URL
+        existing = {entry.name for entry in os.scandir(self.save_dir) if entry.is_file()}
+        if self.pack_path:
+            # Files above PACK_MAX_FILE_SIZE are saved on their own, so check both
+            existing.update(entry['name'] for entry in self.pack_index)
         to_download = []
+        skipped = []
+        # Different URLs may map to the same target; download only the first one
+        queued = {}
+        collisions = []
         for url in self.urls:
-            filename = self.save_dir / Path(url).name
-            if filename.exists():
-                logging.info(f"File already exists, skipping: {filename}")
+            filename = self.save_dir / url_to_filename(url)
+            if filename.name in queued:
+                collisions.append(url)
+                logging.warning(f"Skipping {url}: saves to the same file as {queued[filename.name]}")
+            elif filename.name in existing:
+                skipped.append(filename.name)
+                # Lazy arguments: this runs per URL and is discarded at the default INFO level
+                logging.debug("File already exists, skipping: %s", filename)
             else:
+                queued[filename.name] = url
                 to_download.append(url)
+        logging.info(f"Skipping {len(skipped)} existing files.")
+        if collisions:
+            logging.warning(f"Skipping {len(collisions)} URLs that map to an already queued filename.")
         logging.info(f"{len(to_download)} files to download.")
         return to_download
 
     def download_all(self) -> None:
         """
-        Initiates the download process for all filtered URLs.
+        Initiates the download process for all filtered URLs using a thread pool.
+        """
+        if self.pack_path:
+            self.download_all_to_pack()
+            return
+        self._run_pool(self.download_with_retries)
+
+    def download_all_to_pack(self) -> None:
+        """
+        Downloads all filtered URLs into a single pack file and writes its JSON index.
         """
-        for url in tqdm(self.to_download, desc="Downloading", unit="file"):
-            self.download_with_retries(url)
+        # Drop any bytes appended after the last indexed entry by an interrupted run
+        pack_size = max((entry['offset'] + entry['length'] for entry in self.pack_index), default=0)
+        mode = 'r+b' if self.pack_path.exists() else 'wb'
+        with open(self.pack_path, mode) as pack:
+            pack.truncate(pack_size)
+            pack.seek(pack_size)
+            self._pack = pack
+            try:
+                self._run_pool(self.download_to_pack)
+                drop_page_cache(pack)
+            finally:
+                self._pack = None
+                self.write_pack_index()
 
-    def download_with_retries(self, url: str) -> None:
+    def write_pack_index(self) -> None:
+        """
+        Atomically writes the pack index next to the pack file.
         """
-        Downloads a file with retry logic.
+        index_path = self.pack_path.with_suffix(self.pack_path.suffix + '.index.json')
+        tmp_path = index_path.with_suffix(index_path.suffix + '.part')
+        tmp_path.write_text(json.dumps(self.pack_index, indent=2), encoding='utf-8')
+        os.replace(tmp_path, index_path)
+        logging.info(f"Wrote {len(self.pack_index)} entries to {index_path}")
+
+    def _run_pool(self, download_fn) -> None:
+        """
+        Runs a download function over all filtered URLs on the thread pool.
+
+        Args:
+            download_fn (Callable[[str], None]): Function that downloads a single URL.
+        """
+        # Progress is tracked in bytes; the total grows as each response reports its Content-Length
+        with tqdm(total=0, desc="Downloading", unit='B', unit_scale=True, unit_divisor=1024,
+                  mininterval=0.5, miniters=1 << 20, lock_args=(False,)) as pbar, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            self._pbar = pbar
+            futures = {executor.submit(download_fn, url): url for url in self.to_download}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Unexpected error while downloading {futures[future]}: {e}")
+            self._pbar = None
+
+    def _get_buffer(self) -> bytearray:
+        """
+        Returns the calling thread's reusable read buffer, allocating it on first use.
+
+        Returns:
+            bytearray: A buffer of chunk_size bytes owned by the current thread.
+        """
+        buf = getattr(self._tls, 'buf', None)
+        if buf is None:
+            buf = bytearray(self.chunk_size)
+            self._tls.buf = buf
+        return buf
+
+    def _write_stream(self, response: requests.Response, file_handle, resumed: int = 0) -> None:
+        """
+        Copies a streamed response body into a writable binary file object.
+
+        Progress is counted in bytes read off the wire, which is what Content-Length
+        describes even for gzip/deflate bodies. If the copy fails, this attempt's
+        contribution is removed from the progress bar so that a retry is not counted twice.
+
+        Args:
+            response (requests.Response): A response opened with stream=True.
+            file_handle: Destination binary file object.
+            resumed (int): Bytes of the file already on disk before this response.
+
+        Raises:
+            urllib3.exceptions.IncompleteRead: If an unencoded body is shorter than its
+                Content-Length.
+        """
+        # Read into this thread's buffer to avoid allocating a new bytes object per chunk;
+        # decode_content makes urllib3 transparently decompress gzip/deflate bodies.
+        # The memoryview is taken per write so no export of the buffer outlives readinto.
+        raw = response.raw
+        raw.decode_content = True
+        buf = self._get_buffer()
+        pbar = self._pbar
+        content_length = int(response.headers.get('Content-Length', 0))
+        with self._pbar_lock:
+            pbar.total += resumed + content_length
+        pbar.update(resumed)
+
+        written = 0
+        wire_read = 0
+        try:
+            while (n := raw.readinto(buf)):
+                file_handle.write(memoryview(buf)[:n])
+                written += n
+                wire_now = raw.tell()
+                pbar.update(wire_now - wire_read)
+                wire_read = wire_now
+
+            # Never treat a truncated body as complete, whatever the urllib3 version enforces
+            if (content_length and written < content_length and
+                    response.headers.get('Content-Encoding', 'identity') == 'identity'):
+                raise urllib3.exceptions.IncompleteRead(written, content_length - written)
+        except Exception:
+            with self._pbar_lock:
+                pbar.total -= resumed + content_length
+            pbar.update(-(resumed + wire_read))
+            raise
+
+    def download_with_retries(self, url: str,
+                              response: Optional[requests.Response] = None) -> None:
+        """
+        Downloads a file with retry logic, resuming partial downloads via HTTP Range.
+
+        Connection and status errors are retried with backoff by the mounted HTTPAdapter
+        and are final once they reach this method; this loop only retries failures that
+        occur while reading the body.
 
         Args:
             url (str): The URL of the file to download.
+            response (Optional[requests.Response]): A streaming response for url, requested
+                without a Range header, to use for the first attempt instead of a new request.
         """
-        filename = self.save_dir / Path(url).name
+        filename = self.save_dir / url_to_filename(url)
+        # Write to a .part file first so an interrupted download is never mistaken for a complete one
+        tmp_filename = filename.with_suffix(filename.suffix + '.part')
         for attempt in range(1, MAX_RETRIES + 1):
+            offset = tmp_filename.stat().st_size if tmp_filename.exists() else 0
+            # Ranges apply to the encoded body, so request the identity encoding when resuming
+            headers = {'Range': f'bytes={offset}-', 'Accept-Encoding': 'identity'} if offset else {}
             try:
-                with self.session.get(url, stream=True, timeout=30) as response:
+                if response is None:
+                    response = self.session.get(url, stream=True, timeout=TIMEOUT, headers=headers)
+                with response:
+                    if response.status_code == 416:
+                        # The partial file no longer matches the remote one; start over
+                        logging.warning(f"Partial file rejected by server, restarting: {filename}")
+                        tmp_filename.unlink()
+                        continue
                     response.raise_for_status()
-                    with open(filename, 'wb') as file_handle:
-                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-                            if chunk:
-                                file_handle.write(chunk)
-                logging.info(f"Successfully downloaded: {filename}")
-                break  # Exit the retry loop on success
-            except requests.exceptions.RequestException as e:
+                    if (response.status_code == 206 and
+                            not response.headers.get('Content-Range', '').startswith(f'bytes {offset}-')):
+                        # Appending any other range would corrupt the file; start over
+                        logging.warning(f"Unexpected Content-Range for {url}, restarting: {filename}")
+                        tmp_filename.unlink()
+                        continue
+                    # Append only if the server honoured the Range request
+                    mode = 'ab' if response.status_code == 206 else 'wb'
+                    ensure_free_space(self.save_dir, response)
+                    with open(tmp_filename, mode, buffering=self.chunk_size) as file_handle:
+                        self._write_stream(response, file_handle,
+                                           resumed=offset if mode == 'ab' else 0)
+                        drop_page_cache(file_handle)
+            except STREAM_ERRORS as e:
                 logging.error(f"Attempt {attempt} failed for {url}: {e}")
-                if attempt == MAX_RETRIES:
-                    logging.error(f"Max retries reached. Failed to download: {url}")
-                else:
+                if attempt < MAX_RETRIES:
+                    logging.info(f"Resuming ({attempt}/{MAX_RETRIES})...")
+                continue
+            except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, OSError) as e:
+                logging.error(f"Failed to download {url}: {e}")
+                return
+            finally:
+                response = None
+            os.replace(tmp_filename, filename)
+            logging.info(f"Successfully downloaded: {filename}")
+            return
+        logging.error(f"Max retries reached. Failed to download: {url}")
+
+    def download_to_pack(self, url: str) -> None:
+        """
+        Downloads a file into memory and appends it to the pack file with retry logic.
+
+        Each body is buffered whole so that concurrent workers append contiguous,
+        non-interleaved entries. To bound memory use, a response whose Content-Length
+        is missing or above PACK_MAX_FILE_SIZE is streamed to its own file instead.
+
+        Args:
+            url (str): The URL of the file to download.
+        """
+        name = url_to_filename(url)
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                body = io.BytesIO()
+                # Identity encoding makes Content-Length the exact size held in memory
+                with self.session.get(url, stream=True, timeout=TIMEOUT,
+                                      headers={'Accept-Encoding': 'identity'}) as response:
+                    response.raise_for_status()
+                    content_length = int(response.headers.get('Content-Length', 0))
+                    if not content_length or content_length > PACK_MAX_FILE_SIZE:
+                        logging.info(f"Size unknown or above {PACK_MAX_FILE_SIZE} bytes, "
+                                     f"saving separately: {name}")
+                        self.download_with_retries(url, response)
+                        return
+                    self._write_stream(response, body)
+            except STREAM_ERRORS as e:
+                logging.error(f"Attempt {attempt} failed for {url}: {e}")
+                if attempt < MAX_RETRIES:
                     logging.info(f"Retrying ({attempt}/{MAX_RETRIES})...")
-    
+                continue
+            except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+                logging.error(f"Failed to download {url}: {e}")
+                return
+            with self._pack_lock:
+                offset = self._pack.tell()
+                self._pack.write(body.getbuffer())
+                self.pack_index.append({'name': name, 'offset': offset, 'length': body.tell()})
+            logging.info(f"Successfully packed: {name}")
+            return
+        logging.error(f"Max retries reached. Failed to download: {url}")
+
 def remove_proxy_env_vars() -> None:
     """
     Removes HTTP and HTTPS proxy environment variables if they exist.
@@ -195,6 +576,24 @@ def remove_proxy_env_vars() -> None:
     if not proxies_removed:
         logging.info("No proxy environment variables to remove.")
 
+def positive_int(value: str) -> int:
+    """
+    Argparse type for integers of at least 1.
+
+    Args:
+        value (str): The raw command-line value.
+
+    Returns:
+        int: The parsed value.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
 def parse_arguments() -> argparse.Namespace:
     """
     Parses command-line arguments.
@@ -227,6 +626,21 @@ def parse_arguments() -> argparse.Namespace:
         required=True, 
         help='Path to the text file containing URLs.'
     )
+    parser.add_argument(
+        '--workers', 
+        type=positive_int, 
+        default=DEFAULT_WORKERS, 
+        help=f'Number of concurrent downloads (default: {DEFAULT_WORKERS}).'
+    )
+    parser.add_argument(
+        '--aggregate', 
+        type=Path, 
+        default=None, 
+        help='Pack all downloads into this single file (relative to --save-dir), '
+             'with a JSON index of name, offset and length. Files larger than '
+             f'{PACK_MAX_FILE_SIZE // (1024 * 1024)} MB or without a Content-Length '
+             'are saved separately.'
+    )
     return parser.parse_args()
 
 def main():
@@ -235,23 +649,29 @@ def main():
 
     # Setup logging
     log_path = Path.cwd() / LOG_FILE
-    setup_logging(log_path)
-
-    logging.info("Starting the downloader script.")
-
-    # Remove proxy environment variables
-    remove_proxy_env_vars()
-
-    # Initialize and start the downloader
-    downloader = Downloader(
-        save_dir=args.save_dir,
-        username=args.username,
-        password=args.password,
-        txt_dir=args.txt_dir
-    )
-    downloader.download_all()
-
-    logging.info("Downloader script completed successfully.")
+    listener = setup_logging(log_path)
+
+    try:
+        logging.info("Starting the downloader script.")
+
+        # Remove proxy environment variables
+        remove_proxy_env_vars()
+
+        # Initialize and start the downloader
+        downloader = Downloader(
+            save_dir=args.save_dir,
+            username=args.username,
+            password=args.password,
+            txt_dir=args.txt_dir,
+            workers=args.workers,
+            aggregate=args.aggregate
+        )
+        downloader.download_all()
+
+        logging.info("Downloader script completed successfully.")
+    finally:
+        # Flush queued log records before exiting
+        listener.stop()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Regression tests for the downloader, run against a local HTTP server.
+@Usage:
+    python -m unittest discover -s tests
+"""
+
+import os
+import argparse
+import sys
+import json
+import logging
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import downloader  # noqa: E402
+
+PAYLOAD = os.urandom(2 * 1024 * 1024 + 123)
+SMALL_FILES = {f'small{i}.nc': os.urandom(1000 * i + 7) for i in range(1, 4)}
+
+class FlakyRangeHandler(BaseHTTPRequestHandler):
+    """
+    Serves PAYLOAD (or a SMALL_FILES entry, by name) with byte-range support. While
+    `server.drops` is positive, a response is cut off halfway through its body.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.range_headers.append(self.headers.get('Range'))
+        if self.server.status:
+            self.send_error(self.server.status)
+            return
+        payload = SMALL_FILES.get(self.path.rsplit('/', 1)[-1], PAYLOAD)
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header:
+            start = int(range_header.split('=', 1)[1].split('-', 1)[0])
+            if self.server.wrong_ranges > 0:
+                self.server.wrong_ranges -= 1
+                start = 1
+        body = payload[start:]
+
+        self.send_response(206 if range_header else 200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(len(body)))
+        if range_header:
+            self.send_header('Content-Range', f'bytes {start}-{len(payload) - 1}/{len(payload)}')
+        self.end_headers()
+
+        if self.server.drops > 0:
+            self.server.drops -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.save_dir = Path(self.tmp.name) / 'out'
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyRangeHandler)
+        self.server.drops = 0
+        self.server.status = None
+        self.server.wrong_ranges = 0
+        self.server.range_headers = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/big.bin'
+
+        self.txt_dir = Path(self.tmp.name) / 'urls.txt'
+        self.txt_dir.write_text(self.url + '\n', encoding='utf-8')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def make_downloader(self) -> downloader.Downloader:
+        return downloader.Downloader(self.save_dir, 'user', 'pass', self.txt_dir, workers=1)
+
+    def test_resume_after_dropped_connection(self):
+        self.server.drops = 1
+        self.make_downloader().download_all()
+
+        self.assertEqual((self.save_dir / 'big.bin').read_bytes(), PAYLOAD)
+        self.assertFalse((self.save_dir / 'big.bin.part').exists())
+        self.assertIsNone(self.server.range_headers[0])
+        self.assertIsNotNone(self.server.range_headers[1])
+
+    def test_resume_partial_file_from_previous_run(self):
+        self.save_dir.mkdir(parents=True)
+        half = len(PAYLOAD) // 2
+        (self.save_dir / 'big.bin.part').write_bytes(PAYLOAD[:half])
+
+        self.make_downloader().download_all()
+
+        self.assertEqual((self.save_dir / 'big.bin').read_bytes(), PAYLOAD)
+        self.assertEqual(self.server.range_headers, [f'bytes={half}-'])
+
+    def test_restart_when_server_returns_another_range(self):
+        self.save_dir.mkdir(parents=True)
+        half = len(PAYLOAD) // 2
+        (self.save_dir / 'big.bin.part').write_bytes(PAYLOAD[:half])
+        self.server.wrong_ranges = 1
+
+        self.make_downloader().download_all()
+
+        self.assertEqual((self.save_dir / 'big.bin').read_bytes(), PAYLOAD)
+        self.assertEqual(self.server.range_headers, [f'bytes={half}-', None])
+
+    def test_page_cache_errors_do_not_fail_the_download(self):
+        with mock.patch('downloader.os.fdatasync', side_effect=OSError(22, 'Invalid argument')):
+            self.make_downloader().download_all()
+
+        self.assertEqual((self.save_dir / 'big.bin').read_bytes(), PAYLOAD)
+        self.assertEqual(len(self.server.range_headers), 1)
+
+    def test_insufficient_free_space_fails_before_writing(self):
+        dl = self.make_downloader()
+        full_disk = mock.Mock(f_bavail=1, f_frsize=4096)
+        with mock.patch('downloader.os.statvfs', return_value=full_disk):
+            dl.download_all()
+
+        self.assertFalse((self.save_dir / 'big.bin').exists())
+        self.assertFalse((self.save_dir / 'big.bin.part').exists())
+        self.assertEqual(len(self.server.range_headers), 1)
+
+    def test_url_list_with_byte_order_mark(self):
+        self.txt_dir.write_text(self.url + '\n', encoding='utf-8-sig')
+
+        self.assertEqual(self.make_downloader().urls, [self.url])
+
+    def test_urls_with_the_same_filename_are_downloaded_once(self):
+        self.txt_dir.write_text(f'{self.url}\n{self.url}?mirror=2\n', encoding='utf-8')
+
+        logging.disable(logging.NOTSET)
+        with self.assertLogs(level='WARNING') as logs:
+            dl = self.make_downloader()
+
+        self.assertEqual(dl.to_download, [self.url])
+        self.assertTrue(any(f'{self.url}?mirror=2' in line and self.url in line
+                            for line in logs.output))
+
+    def test_http_error_is_not_retried(self):
+        self.server.status = 404
+        self.make_downloader().download_all()
+
+        self.assertFalse((self.save_dir / 'big.bin').exists())
+        self.assertEqual(len(self.server.range_headers), 1)
+
+    def test_progress_counts_each_byte_once_across_retries(self):
+        final = []
+
+        class RecordingTqdm(downloader.tqdm):
+            def close(self):
+                final.append((self.n, self.total))
+                super().close()
+
+        self.server.drops = 1
+        original_tqdm = downloader.tqdm
+        downloader.tqdm = RecordingTqdm
+        try:
+            self.make_downloader().download_all()
+        finally:
+            downloader.tqdm = original_tqdm
+
+        self.assertEqual(final[0], (len(PAYLOAD), len(PAYLOAD)))
+
+    def test_aggregate_saves_large_files_separately(self):
+        original_cap = downloader.PACK_MAX_FILE_SIZE
+        downloader.PACK_MAX_FILE_SIZE = len(PAYLOAD) - 1
+        try:
+            dl = downloader.Downloader(self.save_dir, 'user', 'pass', self.txt_dir,
+                                       workers=1, aggregate=Path('out.pack'))
+            dl.download_all()
+        finally:
+            downloader.PACK_MAX_FILE_SIZE = original_cap
+
+        self.assertEqual((self.save_dir / 'big.bin').read_bytes(), PAYLOAD)
+        self.assertEqual(dl.pack_index, [])
+        self.assertEqual((self.save_dir / 'out.pack').stat().st_size, 0)
+        # The oversized response is streamed to disk, not requested a second time
+        self.assertEqual(len(self.server.range_headers), 1)
+
+    def test_aggregate_packs_small_files_and_skips_them_on_rerun(self):
+        base_url = self.url.rsplit('/', 1)[0]
+        self.txt_dir.write_text(
+            ''.join(f'{base_url}/{name}\n' for name in SMALL_FILES), encoding='utf-8')
+
+        downloader.Downloader(self.save_dir, 'user', 'pass', self.txt_dir,
+                              workers=2, aggregate=Path('out.pack')).download_all()
+
+        pack = (self.save_dir / 'out.pack').read_bytes()
+        index = json.loads((self.save_dir / 'out.pack.index.json').read_text(encoding='utf-8'))
+        self.assertEqual(sorted(entry['name'] for entry in index), sorted(SMALL_FILES))
+        self.assertEqual(len(pack), sum(len(data) for data in SMALL_FILES.values()))
+        for entry in index:
+            data = pack[entry['offset']:entry['offset'] + entry['length']]
+            self.assertEqual(data, SMALL_FILES[entry['name']])
+
+        requests_made = len(self.server.range_headers)
+        rerun = downloader.Downloader(self.save_dir, 'user', 'pass', self.txt_dir,
+                                      workers=2, aggregate=Path('out.pack'))
+        self.assertEqual(rerun.to_download, [])
+        rerun.download_all()
+        self.assertEqual(len(self.server.range_headers), requests_made)
+        self.assertEqual((self.save_dir / 'out.pack').read_bytes(), pack)
+
+class ArgumentsTest(unittest.TestCase):
+    def test_workers_must_be_positive(self):
+        for value in ('0', '-3', 'abc'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                downloader.positive_int(value)
+        self.assertEqual(downloader.positive_int('4'), 4)
+
+class ChunkSizeTest(unittest.TestCase):
+    def chunk_size_for(self, block_size: int) -> int:
+        with mock.patch('downloader.os.statvfs', return_value=mock.Mock(f_bsize=block_size)):
+            return downloader.optimal_chunk_size(Path('.'))
+
+    def test_small_blocks_use_at_least_chunk_size(self):
+        self.assertEqual(self.chunk_size_for(4096), downloader.CHUNK_SIZE)
+
+    def test_large_blocks_are_capped(self):
+        self.assertEqual(self.chunk_size_for(4 * 1024 * 1024), downloader.MAX_CHUNK_SIZE)
+
+    def test_size_is_a_multiple_of_the_block_size(self):
+        self.assertEqual(self.chunk_size_for(3000) % 3000, 0)
+
+if __name__ == '__main__':
+    unittest.main()